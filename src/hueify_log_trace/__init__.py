@@ -3,6 +3,10 @@
 This package provides utilities for enhancing Python's standard logging and traceback.
 """
 
-from hueify_log_trace.traceback import format_exception
+from hueify_log_trace.traceback import (
+    TracebackFilter,
+    TracebackFilterEntry,
+    format_exception,
+)
 
-__all__ = ["format_exception"]
+__all__ = ["TracebackFilter", "TracebackFilterEntry", "format_exception"]
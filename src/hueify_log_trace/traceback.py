@@ -18,16 +18,84 @@ focus on relevant parts of the traceback.
 
 from __future__ import annotations
 
-import io
+import linecache
 import os
 import re
-from traceback import FrameSummary
+import sys
+from collections import OrderedDict
+from contextlib import suppress
+from functools import cache
+from itertools import groupby
+from operator import itemgetter
+from pathlib import Path
+from traceback import walk_tb
 from typing import IO, TYPE_CHECKING, Literal, NamedTuple, overload
 
-from termcolor import colored
-
 if TYPE_CHECKING:
-    from collections.abc import Iterable
+    from collections.abc import Iterable, Sequence
+
+
+class _Palette(NamedTuple):
+    grey: str
+    grey_bold: str
+    magenta: str
+    dark_grey: str
+    red: str
+    reset: str
+
+
+_PLAIN_PALETTE = _Palette("", "", "", "", "", "")
+_MARKER = "\0"
+
+
+@cache
+def _color_palette() -> _Palette:
+    # Extract the escape sequences ``termcolor.colored`` would put around a text.
+    # ``termcolor`` is imported here so that it is loaded only when colors are used.
+    from termcolor import colored  # noqa: PLC0415
+
+    def prefix(color: str, attrs: Sequence[str] = ()) -> str:
+        return colored(_MARKER, color, attrs=attrs, force_color=True).split(_MARKER)[0]
+
+    return _Palette(
+        grey=prefix("light_grey"),
+        grey_bold=prefix("light_grey", ["bold"]),
+        magenta=prefix("magenta"),
+        dark_grey=prefix("dark_grey"),
+        red=prefix("red"),
+        reset=colored(_MARKER, "red", force_color=True).split(_MARKER)[1],
+    )
+
+
+def _can_colorize(file: IO[str]) -> bool:
+    # Follow the same rules as ``termcolor`` but check the actual output stream
+    if os.environ.get("ANSI_COLORS_DISABLED") or os.environ.get("NO_COLOR"):
+        return False
+    if os.environ.get("FORCE_COLOR"):
+        return True
+    if os.environ.get("TERM") == "dumb":
+        return False
+    try:
+        return file.isatty()
+    except (AttributeError, ValueError):
+        return False
+
+
+_EVALUATION_CACHE_SIZE = 512
+
+_posix_cache: dict[str, str] = {}
+
+
+def _to_posix(filename: str) -> str:
+    # Normalize a file path into the absolute POSIX form used for filtering.
+    # ``Path.absolute`` may call ``os.getcwd``, so the results are memoized.
+    # Both keys and values are interned so that subsequent lookups, here and in the
+    # cache of ``TracebackFilter.evaluate``, mostly succeed by identity comparison.
+    posix = _posix_cache.get(filename)
+    if posix is None:
+        posix = sys.intern(Path(filename).absolute().as_posix())
+        _posix_cache[sys.intern(filename)] = posix
+    return posix
 
 
 TracebackFilterEntry = tuple[Literal["show", "hide"], str | re.Pattern[str]]
@@ -36,7 +104,81 @@ TracebackFilterEntry = tuple[Literal["show", "hide"], str | re.Pattern[str]]
 
 class _CompiledTracebackFilterEntry(NamedTuple):
     show: bool
-    pattern: re.Pattern[str]
+    needles: tuple[str, ...]
+    pattern: re.Pattern[str] | None
+
+
+_LITERAL_PATTERN = re.compile(r"(?:[^.^$*+?{}\[\]\\|()]|\\[^0-9A-Za-z])*", re.DOTALL)
+_ESCAPED_CHAR = re.compile(r"\\(.)", re.DOTALL)
+
+
+def _as_literal(pattern: re.Pattern[str]) -> str | None:
+    # Return the string a pattern matches literally (such as the ones made with
+    # ``re.escape``), or ``None`` if the pattern is not such a simple one.
+    if pattern.flags != re.UNICODE or not _LITERAL_PATTERN.fullmatch(pattern.pattern):
+        return None
+    return _ESCAPED_CHAR.sub(r"\1", pattern.pattern)
+
+
+_GLOBAL_FLAGS = re.compile(r"\(\?[aiLmsux]+\)")
+
+
+def _is_fusible(pattern: re.Pattern[str]) -> bool:
+    # Whether a pattern can be embedded in an alternation without changing its
+    # meaning. Capturing groups may break backreferences or cause conflicts of group
+    # names, global inline flags are allowed only at the start of a pattern, and
+    # comments in verbose patterns would swallow the closing parenthesis.
+    return (
+        pattern.groups == 0
+        and not pattern.flags & re.VERBOSE
+        and not _GLOBAL_FLAGS.match(pattern.pattern)
+    )
+
+
+def _fuse_patterns(patterns: list[re.Pattern[str]]) -> list[re.Pattern[str]]:
+    # Combine patterns sharing the same flags into a single alternation. A pattern
+    # alone is used as is, and the patterns are left as they are if the combined one
+    # cannot be compiled for any reason not caught by ``_is_fusible``.
+    if len(patterns) == 1:
+        return patterns
+    source = "|".join(f"(?:{pattern.pattern})" for pattern in patterns)
+    try:
+        return [re.compile(source, patterns[0].flags)]
+    except re.error:
+        return patterns
+
+
+def _compile_entries(
+    entries: Iterable[tuple[bool, re.Pattern[str]]],
+) -> list[_CompiledTracebackFilterEntry]:
+    # Since the first matching entry wins, all entries in a run of consecutive ones
+    # sharing the same polarity yield the same result, and so can be evaluated at
+    # once in any order. For each run, literal patterns are turned into substring
+    # tests and the others are combined into a single alternation per regex flags,
+    # except for the ones which cannot be embedded safely (see ``_is_fusible``).
+    compiled: list[_CompiledTracebackFilterEntry] = []
+    for show, run in groupby(entries, key=itemgetter(0)):
+        needles: list[str] = []
+        fusibles: dict[int, list[re.Pattern[str]]] = {}
+        patterns: list[re.Pattern[str]] = []
+        for _, pattern in run:
+            needle = _as_literal(pattern)
+            if needle is not None:
+                needles.append(needle)
+            elif _is_fusible(pattern):
+                fusibles.setdefault(pattern.flags, []).append(pattern)
+            else:
+                patterns.append(pattern)
+        patterns[:0] = [
+            fused for group in fusibles.values() for fused in _fuse_patterns(group)
+        ]
+
+        first = patterns[0] if patterns else None
+        compiled.append(_CompiledTracebackFilterEntry(show, tuple(needles), first))
+        compiled.extend(
+            _CompiledTracebackFilterEntry(show, (), p) for p in patterns[1:]
+        )
+    return compiled
 
 
 class TracebackFilter:
@@ -46,16 +188,19 @@ class TracebackFilter:
     based on regular expression patterns. Entries in the filter are evaluated in order,
     and the first matching entry determines whether a frame is shown or hidden.
     If no entries match, the frame is shown by default.
+    Hidden frames are omitted from the output entirely unless ``hide_fully`` is
+    ``False``, in which case only their source lines are omitted.
 
     The matching is done by calling the `search` method of each regular expression
-    pattern against the absolute file path of the stack frame.
+    pattern against the absolute file path of the stack frame, normalized to POSIX
+    format (i.e., using forward slashes as path separators).
 
     The absolute file path of the stack frame to be filtered typically varies depending
     on the execution environment. Therefore, it is recommended to create filtering
     conditions that reflect the runtime environment.
     For example, in an application that uses the ``requests`` package, to hide stack
-    frames from the standard library and site-packages, you can specify the
-    ``filter_rule`` with entries as follows.
+    frames from the standard library and site-packages, you can create the filter
+    with entries as follows.
     However, note that in this example the application itself is not excluded if it is
     installed in site-packages.
 
@@ -69,23 +214,39 @@ class TracebackFilter:
 
         stdlib_path = Path(logging.__file__).parents[1]
         site_packages_path = Path(requests.__file__).parents[1]
-        filter_rule = [
-            ("allow", re.escape(str(site_packages_path.joinpath("my_app")))),
-            ("hide", re.escape(str(stdlib_path))),
-            ("hide", re.escape(str(site_packages_path))),
-        ]
+        traceback_filter = TracebackFilter([
+            ("show", re.escape(site_packages_path.joinpath("my_app").as_posix())),
+            ("hide", re.escape(stdlib_path.as_posix())),
+            ("hide", re.escape(site_packages_path.as_posix())),
+        ])
 
     """
 
-    def __init__(self, entries: Iterable[TracebackFilterEntry]) -> None:
-        """Initialize the TracebackFilter with a list of filter rule entries."""
-        self.entries = [
-            _CompiledTracebackFilterEntry(
+    def __init__(
+        self, entries: Iterable[TracebackFilterEntry], *, hide_fully: bool = True
+    ) -> None:
+        """Initialize the TracebackFilter with a list of filter rule entries.
+
+        Parameters
+        ----------
+        entries : Iterable[TracebackFilterEntry]
+            Filter rule entries to be evaluated in order.
+
+        hide_fully : bool
+            If ``True``, hidden stack frames are entirely omitted from the output.
+            Otherwise, only their source lines are omitted and their locations are
+            still shown. Defaults to ``True``.
+
+        """
+        self.hide_fully = hide_fully
+        self._cache: OrderedDict[str, bool] = OrderedDict()
+        self.entries = _compile_entries(
+            (
                 type_ == "show",
                 re.compile(pattern) if isinstance(pattern, str) else pattern,
             )
             for type_, pattern in entries
-        ]
+        )
 
     def evaluate(self, filename: str) -> bool:
         """Evaluate whether a stack frame should be shown or not based on its filename.
@@ -93,7 +254,7 @@ class TracebackFilter:
         Parameters
         ----------
         filename : str
-            The absolute file path of the stack frame.
+            The absolute file path of the stack frame in POSIX format.
 
         Returns
         -------
@@ -101,10 +262,34 @@ class TracebackFilter:
             Whether the frame should be shown or not.
 
         """
-        for show, pattern in self.entries:
-            if pattern.search(filename):
-                return show
-        return True
+        cached = self._cache.get(filename)
+        if cached is not None:
+            # Another thread may have evicted the entry since it was retrieved
+            with suppress(KeyError):
+                self._cache.move_to_end(filename)
+            return cached
+
+        result = True
+        for show, needles, pattern in self.entries:
+            if any(needle in filename for needle in needles) or (
+                pattern is not None and pattern.search(filename)
+            ):
+                result = show
+                break
+        self._cache[filename] = result
+        if len(self._cache) > _EVALUATION_CACHE_SIZE:
+            # The cache may have been emptied by ``clear_cache`` in another thread
+            with suppress(KeyError):
+                self._cache.popitem(last=False)
+        return result
+
+    def clear_cache(self) -> None:
+        """Clear the cache of evaluation results.
+
+        Results of ``evaluate`` are cached per filename (up to a fixed number of the
+        most recently used ones). Call this method after modifying ``entries``.
+        """
+        self._cache.clear()
 
 
 @overload
@@ -133,6 +318,10 @@ def format_exception(
     format to the standard library's ``traceback.format_exception``, but with added
     colorization for better readability in terminal environments.
 
+    The output is colorized only if ``file`` (or ``sys.stdout`` if ``file`` is
+    ``None``) is a terminal. As with ``termcolor``, this can be overridden by the
+    environment variables ``NO_COLOR``, ``ANSI_COLORS_DISABLED`` and ``FORCE_COLOR``.
+
     If ``traceback_filter`` is provided, it will be used for filtering the stack frames
     based on the specified rules. The filtering rules are evaluated in the order they
     are provided, and the first matching rule determines whether a frame is shown or
@@ -140,8 +329,8 @@ def format_exception(
 
     Note that the path separators in the file paths are **normalized to forward slashes
     (`/`)** for consistency across different platforms. Specifically, when checking
-    against the ``allow_list``, the absolute file paths are converted to POSIX format
-    using ``Path.absolute().as_posix()``.
+    against the ``traceback_filter``, the absolute file paths are converted to POSIX
+    format using ``Path.absolute().as_posix()``.
 
     Parameters
     ----------
@@ -152,12 +341,9 @@ def format_exception(
         Optional file-like object to write to. If ``None``, returns a string.
         Defaults to ``None``.
 
-    filter_rule : Iterable[TracebackFilterEntry] | None
-        Optional sequence of filter rules to apply to the stack frames.
-
-        Each entry should be a tuple of the form ``(type, pattern)``, where the ``type``
-        is either ``"show"`` or ``"hide"``, and the ``pattern`` is a regular expression
-        that matches the absolute file path of the stack frame.
+    traceback_filter : TracebackFilter | None
+        Optional filter to apply to the stack frames. See ``TracebackFilter`` for
+        details of the filter rules.
 
         If ``None``, no filtering is applied, and all stack frames are shown.
         Defaults to ``None``.
@@ -169,47 +355,99 @@ def format_exception(
         ``None``, otherwise `None`.
 
     """
+    colorize = _can_colorize(sys.stdout if file is None else file)
+    palette = _color_palette() if colorize else _PLAIN_PALETTE
+    text = "".join(
+        _format_exception(exc, palette=palette, traceback_filter=traceback_filter)
+    )
     if file is None:
-        with io.StringIO() as buffer:
-            _format_exception(exc, file=buffer, traceback_filter=traceback_filter)
-            return buffer.getvalue()
-    _format_exception(exc, file=file, traceback_filter=traceback_filter)
+        return text
+    file.write(text)
+    file.flush()
     return None
 
 
 def _format_exception(
     exc: BaseException,
     *,
-    file: IO[str],
+    palette: _Palette,
     traceback_filter: TracebackFilter | None = None,
+) -> list[str]:
+    parts = ["Traceback (most recent call last):\n"]
+
+    # Collect the frames first so that per-file work (filtering, splitting the path,
+    # loading the source) is done once for each run of frames from the same file
+    frames = [
+        (frame.f_code.co_filename, frame.f_code.co_name, lineno)
+        for frame, lineno in walk_tb(exc.__traceback__)
+    ]
+    if traceback_filter is None:
+        _format_frames(parts, frames, palette)
+    else:
+        _format_filtered_frames(parts, frames, palette, traceback_filter)
+
+    exc_type = type(exc)
+    type_name = exc_type.__name__
+    if exc_type.__module__ != "builtins":
+        type_name = f"{exc_type.__module__}.{type_name}"
+    parts.append(f"{palette.red}{type_name}: {exc!s}{palette.reset}")
+    return parts
+
+
+def _format_location(filename: str, palette: _Palette) -> str:
+    grey, grey_bold, _, _, _, reset = palette
+    # Like ``os.path.split``, accept ``/`` as a separator on Windows too
+    i = filename.rfind(os.sep)
+    if os.altsep:
+        i = max(i, filename.rfind(os.altsep))
+    i += 1
+    return (
+        f'  File {grey}"{filename[:i]}{reset}'
+        f"{grey_bold}{filename[i:]}{reset}"
+        f'{grey}"{reset}'
+    )
+
+
+def _format_frames(
+    parts: list[str],
+    frames: list[tuple[str, str, int]],
+    palette: _Palette,
 ) -> None:
-    file.write("Traceback (most recent call last):\n")
-
-    tb = exc.__traceback__
-    while tb is not None:
-        frame = tb.tb_frame
-        code = frame.f_code
-        filename = code.co_filename
-        name = code.co_name
-        lineno = tb.tb_lineno
-
-        dirname, basename = os.path.split(filename)
-        linked_location = "File {}{}{}, line {}, in {}".format(
-            colored('"' + dirname + os.sep, color="light_grey"),
-            colored(basename, color="light_grey", attrs=["bold"]),
-            colored('"', color="light_grey"),
-            colored(lineno, color="magenta"),
-            colored(name, color="magenta"),
+    magenta, reset = palette.magenta, palette.reset
+    for filename, group in groupby(frames, key=itemgetter(0)):
+        location = _format_location(filename, palette)
+        parts.extend(
+            f"{location}, line {magenta}{lineno}{reset}, in {magenta}{name}{reset}\n"
+            for _, name, lineno in group
         )
-        file.write(f"  {linked_location}\n")
-        if traceback_filter is not None and traceback_filter.evaluate(filename):
-            line = FrameSummary(filename, lineno, name).line
-            file.write("    {}\n".format(colored(line, color="dark_grey")))
 
-        tb = tb.tb_next
 
-    type_name = re.sub(
-        r"^builtins\.", "", f"{type(exc).__module__}.{type(exc).__name__}"
-    )
-    file.write(colored(f"{type_name}: {exc!s}", color="red"))
-    file.flush()
+def _format_filtered_frames(
+    parts: list[str],
+    frames: list[tuple[str, str, int]],
+    palette: _Palette,
+    traceback_filter: TracebackFilter,
+) -> None:
+    magenta, dark_grey, reset = palette.magenta, palette.dark_grey, palette.reset
+    source_cache: dict[str, list[str]] = {}
+    for filename, group in groupby(frames, key=itemgetter(0)):
+        show = traceback_filter.evaluate(_to_posix(filename))
+        if not show and traceback_filter.hide_fully:
+            continue
+
+        location = _format_location(filename, palette)
+        lines: list[str] = []
+        if show:
+            if filename not in source_cache:
+                source_cache[filename] = linecache.getlines(filename)
+            lines = source_cache[filename]
+
+        for _, name, lineno in group:
+            parts.append(
+                f"{location}"
+                f", line {magenta}{lineno}{reset}"
+                f", in {magenta}{name}{reset}\n"
+            )
+            if show:
+                line = lines[lineno - 1].strip() if 0 < lineno <= len(lines) else ""
+                parts.append(f"    {dark_grey}{line}{reset}\n")
@@ -0,0 +1,287 @@
+# pyright: reportPrivateUsage=false
+
+from __future__ import annotations
+
+import io
+import json
+import os
+import re
+import sys
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+import pytest
+from termcolor import colored
+
+from hueify_log_trace import traceback
+from hueify_log_trace.traceback import TracebackFilter, format_exception
+
+if TYPE_CHECKING:
+    from hueify_log_trace.traceback import TracebackFilterEntry
+
+JSON_DIR = Path(json.__file__).parent.as_posix()
+
+
+@pytest.fixture(autouse=True)
+def _no_color_env(monkeypatch: pytest.MonkeyPatch) -> None:
+    for name in ("ANSI_COLORS_DISABLED", "NO_COLOR", "FORCE_COLOR", "TERM"):
+        monkeypatch.delenv(name, raising=False)
+
+
+def _raise_json_error() -> BaseException:
+    try:
+        json.loads("{")
+    except ValueError as e:
+        return e
+    pytest.fail("json.loads did not raise")
+
+
+def test_literal_patterns_become_substring_tests() -> None:
+    path = "/usr/lib/python3.11/site-packages (x86)"
+    traceback_filter = TracebackFilter([("hide", re.escape(path)), ("hide", "abc")])
+
+    assert len(traceback_filter.entries) == 1
+    assert traceback_filter.entries[0].needles == (path, "abc")
+    assert traceback_filter.entries[0].pattern is None
+    assert not traceback_filter.evaluate(f"{path}/foo.py")
+    assert traceback_filter.evaluate("/usr/lib/python3X11/foo.py")
+
+
+@pytest.mark.parametrize(
+    "pattern",
+    [
+        "a.c",
+        "^/usr",
+        r"\d",
+        re.compile("abc", re.IGNORECASE),
+    ],
+)
+def test_non_literal_patterns_stay_regexes(pattern: str | re.Pattern[str]) -> None:
+    traceback_filter = TracebackFilter([("hide", pattern)])
+
+    assert traceback_filter.entries[0].needles == ()
+    assert traceback_filter.entries[0].pattern is not None
+
+
+def test_consecutive_patterns_are_fused() -> None:
+    traceback_filter = TracebackFilter([("hide", "a.c"), ("hide", "x+y")])
+
+    assert len(traceback_filter.entries) == 1
+    assert traceback_filter.entries[0].pattern is not None
+    assert traceback_filter.entries[0].pattern.pattern == "(?:a.c)|(?:x+y)"
+    assert not traceback_filter.evaluate("/abc.py")
+    assert not traceback_filter.evaluate("/xxy.py")
+    assert traceback_filter.evaluate("/ac.py")
+
+
+def test_lone_pattern_is_used_as_is() -> None:
+    pattern = re.compile("a.c")
+    traceback_filter = TracebackFilter([("hide", pattern)])
+
+    assert traceback_filter.entries[0].pattern is pattern
+
+
+@pytest.mark.parametrize(
+    "entries",
+    [
+        [("hide", "(?i)site-packages")],
+        [("hide", "a.c"), ("hide", "(?i)site-packages")],
+        [("hide", re.compile("site-packages # comment", re.VERBOSE))],
+        [("hide", "a.c"), ("hide", re.compile("site-packages # comment", re.VERBOSE))],
+        [("hide", "a.c"), ("hide", re.compile(r"(site)-packages.*\1"))],
+    ],
+)
+def test_unsafe_patterns_are_not_fused(entries: list[TracebackFilterEntry]) -> None:
+    traceback_filter = TracebackFilter(entries)
+
+    assert not traceback_filter.evaluate("/lib/site-packages/site/foo.py")
+    assert traceback_filter.evaluate("/lib/foo.py")
+
+
+def _always_fusible(_: re.Pattern[str]) -> bool:
+    return True
+
+
+def test_fusion_falls_back_on_error(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(traceback, "_is_fusible", _always_fusible)
+    # Comments in verbose patterns make the fused one fail to compile
+    traceback_filter = TracebackFilter(
+        [
+            ("hide", re.compile("a.c  # comment", re.VERBOSE)),
+            ("hide", re.compile("b.d  # comment", re.VERBOSE)),
+        ]
+    )
+
+    assert len(traceback_filter.entries) == 2
+    assert not traceback_filter.evaluate("/abc.py")
+    assert not traceback_filter.evaluate("/bcd.py")
+    assert traceback_filter.evaluate("/foo.py")
+
+
+def test_first_matching_entry_wins() -> None:
+    traceback_filter = TracebackFilter(
+        [
+            ("show", "site-packages/my_app"),
+            ("hide", "site-packages"),
+            ("show", "a.c"),
+            ("hide", "."),
+        ]
+    )
+
+    assert traceback_filter.evaluate("/site-packages/my_app/foo.py")
+    assert not traceback_filter.evaluate("/site-packages/abc.py")
+    assert traceback_filter.evaluate("/abc.py")
+    assert not traceback_filter.evaluate("/foo.py")
+    assert TracebackFilter([]).evaluate("/foo.py")
+
+
+def test_evaluate_accepts_str_subclass() -> None:
+    class Filename(str):
+        __slots__ = ()
+
+    assert TracebackFilter([("hide", "a.c")]).evaluate(Filename("/foo.py"))
+    assert not TracebackFilter([("hide", "a.c")]).evaluate(Filename("/abc.py"))
+
+
+def test_hide_fully_omits_hidden_frames() -> None:
+    exc = _raise_json_error()
+    traceback_filter = TracebackFilter([("hide", re.escape(JSON_DIR))])
+    output = format_exception(exc, traceback_filter=traceback_filter)
+
+    assert f'File "{__file__}"' in output
+    assert '    json.loads("{")\n' in output
+    assert JSON_DIR not in output
+
+
+def test_hide_partially_omits_source_lines_of_hidden_frames() -> None:
+    exc = _raise_json_error()
+    traceback_filter = TracebackFilter(
+        [("hide", re.escape(JSON_DIR))], hide_fully=False
+    )
+    lines = format_exception(exc, traceback_filter=traceback_filter).splitlines()
+
+    hidden = [i for i, line in enumerate(lines) if f'File "{JSON_DIR}/' in line]
+    assert len(hidden) == 3
+    for i in hidden:
+        assert not lines[i + 1].startswith("    ")
+    assert '    json.loads("{")' in lines
+
+
+def test_all_frames_hidden() -> None:
+    exc = _raise_json_error()
+    traceback_filter = TracebackFilter([("hide", ".")])
+    output = format_exception(exc, traceback_filter=traceback_filter)
+
+    assert output == (
+        f"Traceback (most recent call last):\njson.decoder.JSONDecodeError: {exc}"
+    )
+
+
+def test_location_without_directory() -> None:
+    try:
+        exec(compile("raise ValueError('x')", "<string>", "exec"))
+    except ValueError as e:
+        output = format_exception(e)
+    else:
+        pytest.fail("exec did not raise")
+
+    assert '  File "<string>", line 1, in <module>\n' in output
+
+
+def test_location_splits_directory_and_basename() -> None:
+    palette = traceback._Palette("<g>", "<b>", "", "", "", "</>")
+
+    location = traceback._format_location("/dir/file.py", palette)
+
+    assert location == '  File <g>"/dir/</><b>file.py</><g>"</>'
+
+
+def test_evaluation_cache_evicts_least_recently_used() -> None:
+    traceback_filter = TracebackFilter([("hide", "a.c")])
+    size = traceback._EVALUATION_CACHE_SIZE
+
+    for i in range(size):
+        traceback_filter.evaluate(f"/{i}.py")
+    traceback_filter.evaluate("/0.py")
+    traceback_filter.evaluate(f"/{size}.py")
+
+    assert len(traceback_filter._cache) == size
+    assert "/0.py" in traceback_filter._cache
+    assert "/1.py" not in traceback_filter._cache
+    assert f"/{size}.py" in traceback_filter._cache
+
+
+def test_clear_cache() -> None:
+    traceback_filter = TracebackFilter([("hide", "a.c")])
+    assert not traceback_filter.evaluate("/abc.py")
+
+    traceback_filter.entries = TracebackFilter([("show", "a.c")]).entries
+    assert not traceback_filter.evaluate("/abc.py")
+
+    traceback_filter.clear_cache()
+    assert len(traceback_filter._cache) == 0
+    assert traceback_filter.evaluate("/abc.py")
+
+
+class _TtyStringIO(io.StringIO):
+    def isatty(self) -> bool:
+        return True
+
+
+def test_plain_output_for_non_tty() -> None:
+    buffer = io.StringIO()
+    format_exception(_raise_json_error(), file=buffer)
+
+    assert "\x1b" not in buffer.getvalue()
+
+
+def test_force_color_emits_termcolor_sequences(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    monkeypatch.setenv("FORCE_COLOR", "1")
+    exc = _raise_json_error()
+    tb = exc.__traceback__
+    assert tb is not None
+    dirname, basename = os.path.split(__file__)
+
+    buffer = io.StringIO()
+    format_exception(exc, file=buffer)
+    lines = buffer.getvalue().splitlines()
+
+    assert lines[1] == (
+        "  File "
+        + colored(f'"{dirname}{os.sep}', "light_grey", force_color=True)
+        + colored(basename, "light_grey", attrs=["bold"], force_color=True)
+        + colored('"', "light_grey", force_color=True)
+        + ", line "
+        + colored(tb.tb_lineno, "magenta", force_color=True)
+        + ", in "
+        + colored("_raise_json_error", "magenta", force_color=True)
+    )
+    assert lines[-1] == colored(
+        f"json.decoder.JSONDecodeError: {exc}", "red", force_color=True
+    )
+
+
+@pytest.mark.parametrize("name", ["NO_COLOR", "ANSI_COLORS_DISABLED"])
+def test_env_disables_color_for_tty(monkeypatch: pytest.MonkeyPatch, name: str) -> None:
+    exc = _raise_json_error()
+    buffer = _TtyStringIO()
+    format_exception(exc, file=buffer)
+    assert "\x1b" in buffer.getvalue()
+
+    monkeypatch.setenv(name, "1")
+    buffer = _TtyStringIO()
+    format_exception(exc, file=buffer)
+    assert "\x1b" not in buffer.getvalue()
+
+
+@pytest.mark.parametrize(
+    ("stdout", "colorized"), [(_TtyStringIO, True), (io.StringIO, False)]
+)
+def test_color_for_str_output_follows_stdout(
+    monkeypatch: pytest.MonkeyPatch, stdout: type[io.StringIO], colorized: bool
+) -> None:
+    monkeypatch.setattr(sys, "stdout", stdout())
+
+    assert ("\x1b" in format_exception(_raise_json_error())) is colorized